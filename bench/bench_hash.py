@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+HashAPI压测: 不同线程数下每秒可完成的登录(bcrypt验证)次数
+
+用法:
+    python -m bench.bench_hash --rounds 12 --logins 64
+"""
+from argparse import ArgumentParser
+from asyncio import gather, run
+from os import cpu_count
+from time import perf_counter
+from jhu.security import HashAPI, HashPoolAPI
+
+
+def bench_sync(hash_value: str, logins: int) -> float:
+    """同步验证,即原HashAPI.verify的吞吐"""
+    begin = perf_counter()
+    for _ in range(logins):
+        HashAPI.verify("password", hash_value)
+    return logins / (perf_counter() - begin)
+
+
+def bench_pool(hash_value: str, logins: int, rounds: int, workers: int) -> float:
+    """线程池+asyncio并发验证的吞吐"""
+    async def main(pool: HashPoolAPI):
+        await gather(*[pool.async_verify("password", hash_value) for _ in range(logins)])
+
+    with HashPoolAPI(rounds=rounds, max_workers=workers) as pool:
+        begin = perf_counter()
+        run(main(pool))
+        return logins / (perf_counter() - begin)
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("--rounds", type=int, default=HashAPI.DEFAULT_ROUNDS)
+    parser.add_argument("--logins", type=int, default=32)
+    parser.add_argument("--max-workers", type=int, default=cpu_count() or 1)
+    args = parser.parse_args()
+
+    hash_value = HashAPI.hash("password", args.rounds)
+    print(f"rounds={args.rounds} logins={args.logins} cpu={cpu_count()}")
+    print(f"{'sync':>10}: {bench_sync(hash_value, args.logins):8.2f} logins/s")
+
+    workers = 1
+    while workers <= args.max_workers:
+        rate = bench_pool(hash_value, args.logins, args.rounds, workers)
+        print(f"{f'workers={workers}':>10}: {rate:8.2f} logins/s")
+        workers *= 2
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+import耗时压测: 基于 python -X importtime 统计各模块的冷启动耗时,超出预算时返回非0
+
+每个模块在独立的子进程中导入多次,取最小值以减少抖动
+
+用法:
+    python -m bench.bench_import
+    python -m bench.bench_import --repeat 10 --scale 1.5
+"""
+from argparse import ArgumentParser
+from subprocess import run
+from sys import executable, exit
+
+# 模块 -> 导入耗时预算(毫秒),子模块的第三方依赖均为首次使用时才导入
+BUDGETS = {
+    "jhu": 5,
+    "jhu.auth": 30,
+    "jhu.email": 60,
+    "jhu.orm": 40,
+    "jhu.outbound": 30,
+    "jhu.security": 60,
+    "jhu.webhook": 30,
+}
+
+
+def import_time(module: str) -> float:
+    """在子进程中导入模块,返回该模块的累计导入耗时(毫秒)"""
+    proc = run([executable, "-X", "importtime", "-c", f"import {module}"],
+               capture_output=True, text=True, check=True)
+    for line in proc.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        parts = line.split("|")
+        if len(parts) == 3 and parts[2].strip() == module:
+            return int(parts[1]) / 1000
+    raise RuntimeError(f"未找到模块{module}的导入耗时")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--scale", type=float, default=1.0, help="预算的放大倍数,用于较慢的机器")
+    args = parser.parse_args()
+
+    failed = []
+    for module, budget in BUDGETS.items():
+        cost = min(import_time(module) for _ in range(args.repeat))
+        limit = budget * args.scale
+        status = "OK" if cost <= limit else "FAIL"
+        print(f"{module:>14}: {cost:8.2f} ms / {limit:6.1f} ms {status}")
+        if cost > limit:
+            failed.append(module)
+
+    if failed:
+        print(f"超出预算: {', '.join(failed)}")
+        exit(1)
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+JWTAPI压测: 有无缓存/吊销列表时decode的吞吐以及缓存命中率
+
+用法:
+    python -m bench.bench_jwt --tokens 100 --requests 20000
+"""
+from argparse import ArgumentParser
+from random import Random
+from time import perf_counter
+from jhu.security import JWTAPI, JTIRevocation
+
+
+def bench_decode(api: JWTAPI, tokens: list[str], requests: int) -> float:
+    """随机挑选token进行decode,模拟客户端重复携带同一个token"""
+    rnd = Random(0)
+    picks = [rnd.choice(tokens) for _ in range(requests)]
+    begin = perf_counter()
+    for token in picks:
+        api.decode(token)
+    return requests / (perf_counter() - begin)
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("--tokens", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--revoked", type=int, default=10000)
+    args = parser.parse_args()
+
+    # 名称 -> (JWTAPI, 是否写入吊销的jti);未写入时吊销列表为空,decode跳过吊销检查
+    cases = {
+        "no cache": (JWTAPI("secret"), False),
+        "cache": (JWTAPI("secret", cache_size=args.tokens), False),
+        "revocation": (JWTAPI("secret", revocation=JTIRevocation()), True),
+        "cache+revocation": (JWTAPI("secret", cache_size=args.tokens, revocation=JTIRevocation()), True),
+        "cache+bloom": (JWTAPI("secret", cache_size=args.tokens, revocation=JTIRevocation(args.revoked)), True),
+    }
+
+    for name, (api, revoked) in cases.items():
+        tokens = [api.encode(60, uid=i) for i in range(args.tokens)]
+        if revoked:
+            for i in range(args.revoked):
+                api.revocation.revoke(f"revoked{i}", float("inf"))
+        rate = bench_decode(api, tokens, args.requests)
+        hit_rate = api.cache_info()["hit_rate"]
+        print(f"{name:>18}: {rate:10.0f} decode/s, hit_rate={hit_rate:.2%}, revoked={len(api.revocation)}")
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+JWT后端压测: HS256/RS256/ES256在各后端下encode/decode的吞吐
+"jose(raw key)"为改造前的用法,即每次调用都传入字符串密钥
+
+依赖cryptography生成RS/ES密钥;未安装PyJWT时跳过pyjwt后端
+
+用法:
+    python -m bench.bench_jwt_backend --number 500
+"""
+from argparse import ArgumentParser
+from time import perf_counter
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, rsa
+from jose import jwt
+from jhu.security import JWTAPI, JWTKey, JoseBackend, PyJWTBackend
+
+
+def create_key(algorithm: str) -> tuple[str, str]:
+    """生成测试用的密钥,返回(签名密钥, 验证密钥)"""
+    match(algorithm):
+        case "RS256":
+            private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        case "ES256":
+            private_key = ec.generate_private_key(ec.SECP256R1())
+        case _:
+            key = "0123456789abcdef0123456789abcdef"
+            return key, key
+    private_pem = private_key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                            serialization.NoEncryption()).decode()
+    public_pem = private_key.public_key().public_bytes(serialization.Encoding.PEM,
+                                                       serialization.PublicFormat.SubjectPublicKeyInfo).decode()
+    return private_pem, public_pem
+
+
+def rate(fn, number: int) -> float:
+    begin = perf_counter()
+    for _ in range(number):
+        fn()
+    return number / (perf_counter() - begin)
+
+
+def bench_raw(key: str, public_key: str, algorithm: str, number: int) -> tuple[float, float]:
+    """改造前:每次调用都解析字符串密钥"""
+    token = jwt.encode({"uid": 1}, key=key, algorithm=algorithm)
+    encode = rate(lambda: jwt.encode({"uid": 1}, key=key, algorithm=algorithm), number)
+    decode = rate(lambda: jwt.decode(token, key=public_key, algorithms=[algorithm]), number)
+    return encode, decode
+
+
+def bench_api(api: JWTAPI, number: int) -> tuple[float, float]:
+    token = api.encode(60, uid=1)
+    encode = rate(lambda: api.encode(60, uid=1), number)
+    decode = rate(lambda: api.decode(token), number)
+    return encode, decode
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("--number", type=int, default=500)
+    args = parser.parse_args()
+
+    backends = [JoseBackend()]
+    try:
+        backends.append(PyJWTBackend())
+    except ImportError:
+        print("PyJWT未安装,跳过pyjwt后端")
+
+    print(f"{'algorithm':>9} {'backend':>14} {'encode/s':>10} {'decode/s':>10}")
+    for algorithm in ["HS256", "RS256", "ES256"]:
+        key, public_key = create_key(algorithm)
+        results = {"jose(raw key)": bench_raw(key, public_key, algorithm, args.number)}
+        for backend in backends:
+            results[backend.name] = bench_api(JWTAPI(JWTKey(key, public_key=public_key), algorithm, backend=backend), args.number)
+        for name, (encode, decode) in results.items():
+            print(f"{algorithm:>9} {name:>14} {encode:10.0f} {decode:10.0f}")
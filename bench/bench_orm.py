@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+ORM快速路径压测: 在大表上对比one/scalar_first/check的旧写法与LIMIT 1/EXISTS的耗时
+
+用法:
+    python -m bench.bench_orm --number 20
+"""
+from argparse import ArgumentParser
+from time import perf_counter
+from sqlalchemy import func, select, text
+from bench.suite import ORM_ROWS, create_session
+from jhu.orm import ORM, format_filed
+
+
+def legacy_one(session, stmt):
+    """旧的one: 语句不加limit,取第一行"""
+    if (one := next(ORM.mapping(session, stmt), None)) is None:
+        return None
+    return format_filed(dict(**one))
+
+
+def legacy_exists(session, stmt):
+    """旧的check: 统计全部匹配的行数"""
+    return session.scalar(stmt.with_only_columns(func.count(text("1")))) > 0
+
+
+def timeit(fn, number: int) -> float:
+    """单次耗时(毫秒)"""
+    fn()
+    begin = perf_counter()
+    for _ in range(number):
+        fn()
+    return (perf_counter() - begin) / number * 1000
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("--number", type=int, default=20)
+    args = parser.parse_args()
+
+    session = create_session()
+    User = session.info["User"]
+
+    # 与接口中的用法一致,每次调用都重新构造语句;约三分之一的行满足status == 1
+    def many():
+        return select(User.id, User.account, User.name).where(User.status == 1)
+
+    def unique():
+        return select(User.id, User.account, User.name).where(User.account == "acct050000")
+
+    def flag():
+        return select(1).where(User.status == 1)
+
+    def ids():
+        return select(User.id).where(User.status == 1)
+
+    cases = {
+        "one(status=1)": (lambda: legacy_one(session, many()), lambda: ORM.one(session, many())),
+        "one(account)": (lambda: legacy_one(session, unique()), lambda: ORM.one(session, unique())),
+        "exists(status=1)": (lambda: legacy_exists(session, flag()), lambda: ORM.exists(session, flag())),
+        "scalar_first(status=1)": (lambda: session.scalars(ids()).first(), lambda: ORM.scalar_first(session, ids())),
+    }
+
+    print(f"rows={ORM_ROWS}")
+    for name, (before, after) in cases.items():
+        before_ms, after_ms = timeit(before, args.number), timeit(after, args.number)
+        print(f"{name:>22}: {before_ms:10.3f} ms -> {after_ms:10.3f} ms ({before_ms / after_ms:6.1f}x)")
@@ -0,0 +1,130 @@
+"""
+压测用的本地服务,使压测可以离线运行
+ - StubHTTPServer: 模拟钉钉/飞书开放平台以及webhook接口
+ - StubSMTPServer: 只实现邮件发送需要的最小SMTP命令集
+"""
+import json
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from socketserver import StreamRequestHandler, ThreadingTCPServer
+from threading import Thread
+
+# 路径 -> 返回的json
+ROUTES = {
+    # 钉钉
+    "/v1.0/oauth2/userAccessToken": {"accessToken": "stub-access-token", "expireIn": 7200},
+    "/v1.0/contact/users/me": {"nick": "stub", "unionId": "stub-union-id", "mobile": "18012345678"},
+    # 飞书
+    "/open-apis/auth/v3/app_access_token/internal": {"code": 0, "app_access_token": "stub-app-token"},
+    "/open-apis/authen/v1/oidc/access_token": {"code": 0, "data": {"access_token": "stub-user-token"}},
+    "/open-apis/authen/v1/user_info": {"code": 0, "data": {"name": "stub", "mobile": "+8618012345678"}},
+    # webhook
+    "/robot/send": {"errcode": 0, "errmsg": "ok"},
+    "/cgi-bin/webhook/send": {"errcode": 0, "errmsg": "ok"},
+}
+
+
+class StubHTTPHandler(BaseHTTPRequestHandler):
+    # 支持keep-alive,与真实的上游一致
+    protocol_version = "HTTP/1.1"
+    # 响应头和响应体分两次写入,不关闭Nagle会触发40ms的延迟确认
+    disable_nagle_algorithm = True
+
+    def _reply(self):
+        if length := int(self.headers.get("Content-Length", 0)):
+            self.rfile.read(length)
+
+        path = self.path.split("?")[0]
+        if (data := ROUTES.get(path)) is None:
+            status, body = 404, b"{}"
+        else:
+            status, body = 200, json.dumps(data).encode()
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = _reply
+    do_POST = _reply
+
+    def log_message(self, *args):
+        ...
+
+
+class StubSMTPHandler(StreamRequestHandler):
+    disable_nagle_algorithm = True
+
+    def reply(self, line: str) -> None:
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        self.reply("220 stub ESMTP")
+        while line := self.rfile.readline():
+            cmd = line.decode().strip().split(" ")[0].upper()
+            match(cmd):
+                case "EHLO":
+                    self.reply("250-stub")
+                    self.reply("250 AUTH PLAIN")
+                case "HELO" | "MAIL" | "RCPT" | "RSET" | "NOOP":
+                    self.reply("250 OK")
+                case "AUTH":
+                    self.reply("235 Authentication successful")
+                case "DATA":
+                    self.reply("354 End data with <CR><LF>.<CR><LF>")
+                    while self.rfile.readline() not in (b".\r\n", b""):
+                        ...
+                    self.reply("250 OK")
+                case "QUIT":
+                    self.reply("221 Bye")
+                    return
+                case _:
+                    self.reply("502 Command not implemented")
+
+
+class _ThreadingTCPServer(ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+class _StubServer:
+    def __init__(self, server) -> None:
+        self._server = server
+        self._thread = Thread(target=server.serve_forever, daemon=True)
+        self._thread.start()
+
+    @property
+    def host(self) -> str:
+        return self._server.server_address[0]
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    def close(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class StubHTTPServer(_StubServer):
+    def __init__(self) -> None:
+        """本地HTTP服务,监听随机端口"""
+        server = ThreadingHTTPServer(("127.0.0.1", 0), StubHTTPHandler)
+        server.daemon_threads = True
+        super().__init__(server)
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+
+class StubSMTPServer(_StubServer):
+    def __init__(self) -> None:
+        """本地SMTP服务,监听随机端口"""
+        super().__init__(_ThreadingTCPServer(("127.0.0.1", 0), StubSMTPHandler))
@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+"""
+jhu各模块热点路径的压测集合,使用本地HTTP/SMTP服务以及SQLite,可离线运行
+
+用法:
+    # 运行并保存基线
+    python -m bench.suite --save baseline.json
+    # 与基线对比,任一用例变慢超过20%时返回非0
+    python -m bench.suite --baseline baseline.json --threshold 0.2
+    # 单独放宽某个用例的阈值,只运行部分用例
+    python -m bench.suite --baseline baseline.json --case-threshold email.send_attachments=0.5 -k orm -k security
+"""
+import gc
+import json
+from argparse import ArgumentParser
+from contextlib import ExitStack
+from datetime import datetime, timedelta
+from pathlib import Path
+from platform import platform, python_version
+from statistics import median
+from sys import exit
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from typing import Any, Callable
+from bench.stubs import StubHTTPServer, StubSMTPServer
+
+# 用例名 -> setup函数, setup返回被压测的无参函数
+CASES: dict[str, Callable[["BenchEnv"], Callable[[], Any]]] = {}
+
+# ORM用例的数据量
+ORM_ROWS = 100_000
+# bcrypt用例的cost,保持较低以便快速运行,只用于比较相对变化
+BCRYPT_ROUNDS = 6
+
+
+def case(name: str):
+    """注册压测用例"""
+    def wrapper(fn):
+        CASES[name] = fn
+        return fn
+    return wrapper
+
+
+class BenchEnv:
+    def __init__(self, stack: ExitStack) -> None:
+        """压测环境,本地服务以及数据库按需创建,在stack关闭时释放"""
+        self._stack = stack
+        self._http: StubHTTPServer | None = None
+        self._smtp: StubSMTPServer | None = None
+        self._session = None
+        self._tmpdir: Path | None = None
+
+    @property
+    def stack(self) -> ExitStack:
+        return self._stack
+
+    @property
+    def http(self) -> StubHTTPServer:
+        if self._http is None:
+            self._http = self.stack.enter_context(StubHTTPServer())
+        return self._http
+
+    @property
+    def smtp(self) -> StubSMTPServer:
+        if self._smtp is None:
+            self._smtp = self.stack.enter_context(StubSMTPServer())
+        return self._smtp
+
+    @property
+    def tmpdir(self) -> Path:
+        if self._tmpdir is None:
+            self._tmpdir = Path(self.stack.enter_context(TemporaryDirectory()))
+        return self._tmpdir
+
+    @property
+    def session(self):
+        """已写入ORM_ROWS行数据的SQLite会话"""
+        if self._session is None:
+            self._session = self.stack.enter_context(create_session())
+        return self._session
+
+
+def create_session():
+    """创建内存SQLite并写入测试数据"""
+    from sqlalchemy import DateTime, Integer, String, create_engine, insert
+    from sqlalchemy.orm import DeclarativeBase, Mapped, Session, mapped_column
+
+    class Base(DeclarativeBase):
+        ...
+
+    class User(Base):
+        __tablename__ = "user"
+        id: Mapped[int] = mapped_column(Integer, primary_key=True)
+        account: Mapped[str] = mapped_column(String(32), index=True)
+        name: Mapped[str] = mapped_column(String(32))
+        status: Mapped[int] = mapped_column(Integer, index=True)
+        created_at: Mapped[datetime] = mapped_column(DateTime)
+        updated_at: Mapped[datetime] = mapped_column(DateTime)
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+
+    begin = datetime(2024, 1, 1)
+    rows = [{"id": i, "account": f"acct{i:06d}", "name": f"user{i}", "status": i % 3,
+             "created_at": begin + timedelta(minutes=i), "updated_at": begin + timedelta(minutes=i)}
+            for i in range(1, ORM_ROWS + 1)]
+
+    session = Session(engine)
+    session.execute(insert(User), rows)
+    session.commit()
+    session.info["User"] = User
+    return session
+
+
+@case("auth.dingtalk_login")
+def bench_dingtalk_login(env: BenchEnv):
+    import jhu.auth
+    from jhu.auth import DingTalk
+
+    jhu.auth.DINGTALK_API = env.http.url
+    d = DingTalk("ding_ak", "ding_sk")
+    return lambda: d.get_user_info("auth_code")
+
+
+@case("auth.feishu_login")
+def bench_feishu_login(env: BenchEnv):
+    import jhu.auth
+    from jhu.auth import FeiShu
+
+    jhu.auth.FEISHU_API = env.http.url
+    f = FeiShu("feishu_ak", "feishu_sk")
+    return lambda: f.get_user_info("auth_code")
+
+
+@case("webhook.dingtalk_send")
+def bench_dingtalk_send(env: BenchEnv):
+    from jhu.webhook import WebHook, WebHookType
+
+    wh = WebHook(WebHookType.DINGTALK, f"{env.http.url}/robot/send?access_token=token", "sk")
+    data = wh.markdown("# 压测\n- 内容", title="压测")
+    return lambda: wh.send(data)
+
+
+@case("webhook.wecom_broadcast")
+def bench_wecom_broadcast(env: BenchEnv):
+    """同一条消息发送到10个群"""
+    from jhu.webhook import WebHook, WebHookType
+
+    hooks = [WebHook(WebHookType.WECOM, f"{env.http.url}/cgi-bin/webhook/send?key={i}") for i in range(10)]
+    data = hooks[0].text("压测内容", phone=["@all"])
+
+    def broadcast():
+        for wh in hooks:
+            wh.send(data)
+    return broadcast
+
+
+@case("email.send_attachments")
+def bench_email_send(env: BenchEnv):
+    from jhu.email import EmailSender
+
+    attach_list = []
+    for idx in range(2):
+        path = env.tmpdir / f"attach{idx}.txt"
+        path.write_text("压测附件内容\n" * 4096)
+        attach_list.append(str(path))
+
+    e = EmailSender(env.smtp.host, env.smtp.port, ssl=False)
+    env.stack.callback(e.close)
+    e.login("bench@jhu.com", "passwd", "bench")
+    return lambda: e.send("压测", "<h1>压测</h1>", attach_list, to=["a@a.com"], cc=["b@b.com"])
+
+
+@case("orm.pagination")
+def bench_orm_pagination(env: BenchEnv):
+    from sqlalchemy import select
+    from jhu.orm import ORM
+
+    session = env.session
+    User = session.info["User"]
+    stmt = select(User.id, User.account, User.name, User.created_at).where(User.status == 1)
+    return lambda: ORM.pagination(session, stmt, page_idx=100, page_size=20, order=[User.id.desc()])
+
+
+@case("orm.check")
+def bench_orm_check(env: BenchEnv):
+    from jhu.orm import ORM, ORMCheckRule
+
+    session = env.session
+    User = session.info["User"]
+    rules = [ORMCheckRule(1, User.account == "acct000000"),
+             ORMCheckRule(2, User.name == "nobody"),
+             ORMCheckRule(3, User.account == "acct050000")]
+    return lambda: ORM.check(session, rules, User.id != 50000)
+
+
+@case("orm.one")
+def bench_orm_one(env: BenchEnv):
+    from sqlalchemy import select
+    from jhu.orm import ORM
+
+    session = env.session
+    User = session.info["User"]
+    return lambda: ORM.one(session, select(User.id, User.account, User.created_at).where(User.status == 1))
+
+
+@case("orm.all")
+def bench_orm_all(env: BenchEnv):
+    from sqlalchemy import select
+    from jhu.orm import ORM
+
+    session = env.session
+    User = session.info["User"]
+    stmt = select(User.id, User.account, User.created_at, User.updated_at).where(User.id <= 1000)
+    return lambda: ORM.all(session, stmt)
+
+
+@case("security.aes_phone")
+def bench_aes_phone(env: BenchEnv):
+    from jhu.security import AESAPI
+
+    aes = AESAPI("0123456789abcdef")
+    return lambda: aes.phone_decrypt(aes.phone_encrypt("18012345678"))
+
+
+@case("security.jwt_encode")
+def bench_jwt_encode(env: BenchEnv):
+    from jhu.security import JWTAPI
+
+    api = JWTAPI("secret")
+    return lambda: api.encode(30, uid=1)
+
+
+@case("security.jwt_decode")
+def bench_jwt_decode(env: BenchEnv):
+    from jhu.security import JWTAPI
+
+    api = JWTAPI("secret")
+    token = api.encode(30, uid=1)
+    return lambda: api.decode(token)
+
+
+@case("security.bcrypt_verify")
+def bench_bcrypt_verify(env: BenchEnv):
+    from jhu.security import HashAPI
+
+    hash_value = HashAPI.hash("password", BCRYPT_ROUNDS)
+    return lambda: HashAPI.verify("password", hash_value)
+
+
+def measure(op: Callable[[], Any], repeat: int, min_time: float) -> dict:
+    """每轮至少运行min_time秒,记录各轮单次耗时的最小值和中位数;
+    最小值受机器上其他负载的影响最小,用于和基线对比
+    """
+    # 预热,首次调用包含建连/缓存等一次性开销,用第二次调用估算单次耗时
+    op()
+    begin = perf_counter()
+    op()
+    number = max(1, int(min_time / max(perf_counter() - begin, 1e-7)))
+
+    timings = []
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            begin = perf_counter()
+            for _ in range(number):
+                op()
+            timings.append((perf_counter() - begin) / number)
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+    best = min(timings)
+    return {"min_us": best * 1e6, "median_us": median(timings) * 1e6, "ops_per_sec": 1 / best,
+            "number": number, "repeat": repeat}
+
+
+def slowdown(name: str, result: dict, baseline: dict) -> float | None:
+    """相对基线变慢的比例,基线中没有该用例时返回None"""
+    if (base := baseline.get("results", {}).get(name)) is None:
+        return None
+    return result["min_us"] / base["min_us"] - 1
+
+
+def compare(results: dict, baseline: dict, threshold: float, case_thresholds: dict[str, float]) -> list[str]:
+    """按最小耗时与基线对比,返回变慢超过阈值的用例"""
+    regressions = []
+    for name, result in results.items():
+        if (change := slowdown(name, result, baseline)) is None:
+            continue
+        base = baseline["results"][name]
+        limit = case_thresholds.get(name, threshold)
+        status = "REGRESSION" if change > limit else "OK"
+        print(f"{name:>26}: {base['min_us']:12.1f} us -> {result['min_us']:12.1f} us {change:+8.1%} (limit {limit:+.0%}) {status}")
+        if change > limit:
+            regressions.append(name)
+    return regressions
+
+
+def main() -> int:
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("-k", dest="keywords", action="append", default=[], help="只运行名称包含该关键字的用例,可多次指定")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--min-time", type=float, default=0.3, help="每轮的最少运行时间(秒)")
+    parser.add_argument("--save", type=Path, help="把结果保存为json基线")
+    parser.add_argument("--baseline", type=Path, help="对比的json基线")
+    parser.add_argument("--threshold", type=float, default=0.2, help="允许变慢的比例,默认0.2即20%%")
+    parser.add_argument("--case-threshold", action="append", default=[], metavar="NAME=RATIO", help="单个用例的阈值")
+    parser.add_argument("--retries", type=int, default=2, help="超过阈值的用例重新测量的次数,取最好的结果")
+    args = parser.parse_args()
+
+    case_thresholds = {}
+    for item in args.case_threshold:
+        name, ratio = item.split("=")
+        case_thresholds[name] = float(ratio)
+
+    names = [name for name in CASES if not args.keywords or any(k in name for k in args.keywords)]
+    baseline = json.loads(args.baseline.read_text()) if args.baseline else {}
+    results = {}
+    with ExitStack() as stack:
+        env = BenchEnv(stack)
+        ops = {}
+        for name in names:
+            ops[name] = CASES[name](env)
+            results[name] = measure(ops[name], args.repeat, args.min_time)
+            print(f"{name:>26}: min {results[name]['min_us']:12.1f} us median {results[name]['median_us']:12.1f} us {results[name]['ops_per_sec']:12.1f} ops/s")
+
+        # 机器上短暂的负载可能让整个用例变慢,超过阈值的用例重新测量,排除误报
+        for _ in range(args.retries):
+            suspects = [name for name in names
+                        if (slowdown(name, results[name], baseline) or 0) > case_thresholds.get(name, args.threshold)]
+            for name in suspects:
+                print(f"{name:>26}: 超过阈值,重新测量")
+                if (result := measure(ops[name], args.repeat, args.min_time))["min_us"] < results[name]["min_us"]:
+                    results[name] = result
+
+    if args.save:
+        data = {"python": python_version(), "platform": platform(),
+                "created_at": datetime.now().isoformat(timespec="seconds"), "results": results}
+        args.save.write_text(json.dumps(data, indent=2, ensure_ascii=False))
+
+    if args.baseline:
+        regressions = compare(results, baseline, args.threshold, case_thresholds)
+        if regressions:
+            print(f"性能退化: {', '.join(regressions)}")
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
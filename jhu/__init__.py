@@ -0,0 +1,47 @@
+"""
+jhu: Join Happy Universe
+
+子模块以及常用类按需加载(PEP 562),
+如 from jhu import HashAPI 只会导入jhu.security,不会导入requests,sqlalchemy等依赖
+"""
+from importlib import import_module
+
+_SUBMODULES = {"auth", "email", "orm", "outbound", "security", "webhook"}
+
+# 属性名 -> 所在子模块
+_ATTRS = {
+    "AuthType": "auth",
+    "DingTalk": "auth",
+    "FeiShu": "auth",
+    "EmailSender": "email",
+    "ORM": "orm",
+    "ORMCheckRule": "orm",
+    "ORMFormatRule": "orm",
+    "AESAPI": "security",
+    "HashAPI": "security",
+    "HashPoolAPI": "security",
+    "JWTAPI": "security",
+    "JWTKey": "security",
+    "JTIRevocation": "security",
+    "WebHook": "webhook",
+    "WebHookType": "webhook",
+}
+
+__all__ = sorted(_SUBMODULES | _ATTRS.keys())
+
+
+def __getattr__(name: str):
+    if name in _SUBMODULES:
+        return import_module(f"{__name__}.{name}")
+
+    if (module := _ATTRS.get(name)) is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    value = getattr(import_module(f"{__name__}.{module}"), name)
+    # 缓存到模块中,之后的访问不再经过__getattr__
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return __all__
@@ -3,7 +3,13 @@
 """
 from enum import IntEnum
 from urllib.parse import quote_plus
-from requests import post, get
+from jhu.outbound import THROTTLED, get, post
+
+# 开放平台的接口地址,压测时可替换为本地服务
+DINGTALK_API = "https://api.dingtalk.com"
+FEISHU_API = "https://open.feishu.cn"
+# 飞书接口频率限制的错误码
+FEISHU_THROTTLE_CODE = 99991400
 
 
 class AuthType(IntEnum):
@@ -13,6 +19,20 @@ class AuthType(IntEnum):
     FEISHU = 1
 
 
+def _feishu_classify(rsp) -> str | None:
+    """飞书接口出错时HTTP状态码可能仍为200,按返回的code判断调用结果"""
+    try:
+        code = rsp.json().get("code")
+    except ValueError:
+        return "invalid json"
+
+    if code == FEISHU_THROTTLE_CODE:
+        return THROTTLED
+    if code != 0:
+        return f"code {code}"
+    return None
+
+
 def get_dingtalk_user_info(ak: str, sk: str, auth_code: str) -> dict:
     """获取钉钉用户信息
 
@@ -22,18 +42,18 @@ def get_dingtalk_user_info(ak: str, sk: str, auth_code: str) -> dict:
         auth_code: 钉钉扫码得到的auth_code, 如:e8ce805bbd5434168292f75c11832eac
     """
     # 1.获取access_token
-    ACCESS_TOKEN_URL = "https://api.dingtalk.com/v1.0/oauth2/userAccessToken"
+    ACCESS_TOKEN_URL = f"{DINGTALK_API}/v1.0/oauth2/userAccessToken"
     data = {"clientId": ak, "clientSecret": sk,
             "code": auth_code, "grantType": "authorization_code"}
 
-    with post(ACCESS_TOKEN_URL, json=data) as rsp:
+    with post(ACCESS_TOKEN_URL, "dingtalk.user_access_token", json=data) as rsp:
         access_token = rsp.json().get("accessToken", "")
 
     # 2.获取用户信息
-    USER_INFO_URL = "https://api.dingtalk.com/v1.0/contact/users/me"
+    USER_INFO_URL = f"{DINGTALK_API}/v1.0/contact/users/me"
     headers = {"x-acs-dingtalk-access-token": f"{access_token}"}
 
-    with get(USER_INFO_URL, headers=headers) as rsp:
+    with get(USER_INFO_URL, "dingtalk.user_info", headers=headers) as rsp:
         result = rsp.json()
 
     return result
@@ -49,22 +69,22 @@ def get_feishu_user_info(ak: str, sk: str, auth_code: str) -> dict:
     """
     # 1.获取app_access_token
     app_access_token_data = {"app_id": ak, "app_secret": sk}
-    APP_ACCESS_TOKEN_URL = "https://open.feishu.cn/open-apis/auth/v3/app_access_token/internal"
-    with post(APP_ACCESS_TOKEN_URL, json=app_access_token_data) as rsp:
+    APP_ACCESS_TOKEN_URL = f"{FEISHU_API}/open-apis/auth/v3/app_access_token/internal"
+    with post(APP_ACCESS_TOKEN_URL, "feishu.app_access_token", json=app_access_token_data, classify=_feishu_classify) as rsp:
         app_access_token = rsp.json().get("app_access_token", "")
 
     # 2.获取access_token
-    ACCESS_TOKEN_URL = "https://open.feishu.cn/open-apis/authen/v1/oidc/access_token"
+    ACCESS_TOKEN_URL = f"{FEISHU_API}/open-apis/authen/v1/oidc/access_token"
     access_token_headers = {"Authorization": f"Bearer {app_access_token}"}
     access_token_data = {"grant_type": "authorization_code", "code": auth_code}
-    with post(ACCESS_TOKEN_URL, headers=access_token_headers, json=access_token_data) as rsp:
+    with post(ACCESS_TOKEN_URL, "feishu.user_access_token", headers=access_token_headers, json=access_token_data, classify=_feishu_classify) as rsp:
         user_access_token = rsp.json()["data"]["access_token"]
 
     # 3.获取用户信息
-    USER_INFO_URL = "https://open.feishu.cn/open-apis/authen/v1/user_info"
+    USER_INFO_URL = f"{FEISHU_API}/open-apis/authen/v1/user_info"
     user_access_token_headers = {
         "Authorization": f"Bearer {user_access_token}"}
-    with get(USER_INFO_URL, headers=user_access_token_headers) as rsp:
+    with get(USER_INFO_URL, "feishu.user_info", headers=user_access_token_headers, classify=_feishu_classify) as rsp:
         result = rsp.json()
     return result
 
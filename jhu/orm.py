@@ -1,12 +1,21 @@
+"""
+sqlalchemy以及pytz在首次使用时才导入,类型注解仅用于类型检查
+
+sqlalchemy按语句结构缓存编译结果,结构相同、参数不同的语句只编译一次;
+这里生成的语句(LIMIT 1,EXISTS,count)保持可缓存,并复用不变的部分
+"""
+from __future__ import annotations
 from datetime import datetime
 from dataclasses import dataclass
+from functools import cache
 from math import ceil
-from typing import Callable, Any
+from typing import Callable, Any, TYPE_CHECKING
 from urllib.parse import quote_plus
-from sqlalchemy import func, select, Select, MappingResult, text
-from sqlalchemy.orm import Session
-from sqlalchemy.sql.elements import BinaryExpression
-from pytz import timezone
+
+if TYPE_CHECKING:
+    from sqlalchemy import Select, MappingResult
+    from sqlalchemy.orm import Session
+    from sqlalchemy.sql.elements import BinaryExpression
 
 
 @dataclass
@@ -25,6 +34,8 @@ class ORMFormatRule:
 
 def format_datetime(dt: datetime) -> str:
     """格式化日期"""
+    from pytz import timezone
+
     utc_dt = timezone("UTC").localize(dt)
     shanghai_zone = timezone("Asia/Shanghai")
     target_dt = utc_dt.astimezone(shanghai_zone)
@@ -48,6 +59,27 @@ def format_filed(data: dict, rules: list[ORMFormatRule] = []) -> dict:
     return data
 
 
+@cache
+def _count_column():
+    """count(1)列,所有counts共用"""
+    from sqlalchemy import func, text
+
+    return func.count(text("1"))
+
+
+def _limit_one(stmt):
+    """未设置limit的select语句加上LIMIT 1,其余语句原样返回
+
+    sqlalchemy没有公开判断是否已设置limit的接口,这里依赖私有属性Select._limit_clause,
+    升级sqlalchemy时需确认test/orm.py中的test_limit_one仍然通过
+    """
+    from sqlalchemy import Select
+
+    if isinstance(stmt, Select) and stmt._limit_clause is None:
+        return stmt.limit(1)
+    return stmt
+
+
 class ORM:
     @staticmethod
     def build_engine_url(dialect_dbapi: str, host: str, port: str, username: str = "", passwd: str = "", database: str = "", **kw) -> str:
@@ -97,14 +129,25 @@ class ORM:
 
     @staticmethod
     def one(session: Session, stmt: Select, format_rules: list[ORMFormatRule] = []) -> dict | None:
-        """获取第一行数据"""
-        try:
-            one = next(ORM.mapping(session, stmt))
-            data = format_filed(dict(**one), format_rules)
-        except StopIteration:
+        """获取第一行数据,未设置limit时自动加上LIMIT 1,避免数据库返回多余的行"""
+        if (one := ORM.mapping(session, _limit_one(stmt)).first()) is None:
             return None
 
-        return data
+        return format_filed(dict(**one), format_rules)
+
+    @staticmethod
+    def scalar_first(session: Session, stmt: Select) -> Any:
+        """获取第一行第一列的值,没有数据时返回None;未设置limit时自动加上LIMIT 1
+        注意与sqlalchemy的scalar_one不同,多行时不会报错,只取第一行
+        """
+        return session.scalars(_limit_one(stmt)).first()
+
+    @staticmethod
+    def exists(session: Session, stmt: Select) -> bool:
+        """是否存在数据,使用SELECT EXISTS,数据库找到第一行即返回"""
+        from sqlalchemy import select
+
+        return bool(session.scalar(select(stmt.exists())))
 
     @staticmethod
     def counts(session: Session, stmt: Select) -> int:
@@ -112,8 +155,7 @@ class ORM:
         """
         # return session.scalar(stmt)
         # select语句中如果带有group by字段,那么with_only_columns会导致总数计算不正确
-        filed_temp = func.count(text("1"))
-        if (result := session.scalar(stmt.with_only_columns(filed_temp))) is None:
+        if (result := session.scalar(stmt.with_only_columns(_count_column()))) is None:
             result = 0
         return result
 
@@ -164,12 +206,14 @@ class ORM:
             None:检测通过
             str | int:检测未通过,异常代码
         """
+        from sqlalchemy import select
+
         base_stmt = select(1)
 
         if except_expression is not None:
             base_stmt = base_stmt.where(except_expression)
 
         for rule in rules:
-            stmt = base_stmt.where(rule.condition)
-            if ORM.counts(session, stmt) > 0:
+            # 只需判断是否存在,不必统计全部匹配的行
+            if ORM.exists(session, base_stmt.where(rule.condition)):
                 return rule.errcode
@@ -0,0 +1,362 @@
+"""
+外部HTTP调用的统一埋点,auth和webhook的上游调用均经过这里
+ - 各阶段耗时:DNS解析,TCP建连,TLS握手,首字节(TTFB),总耗时;复用连接时前三项为0
+ - 按接口(endpoint)统计的耗时直方图,以及错误/限流计数
+ - 可插拔的导出器,默认不导出
+ - 调用截止时间(deadline)传递,多次上游调用共享同一个时间预算
+
+用法:
+    from jhu.outbound import deadline, metrics, LoggingExporter
+
+    metrics.exporter = LoggingExporter()
+    with deadline(3):
+        DingTalk(ak, sk).get_user_info(auth_code)
+    metrics.snapshot()
+"""
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from functools import cache
+from logging import getLogger
+from socket import SOCK_STREAM, getaddrinfo
+from threading import Lock, local
+from time import monotonic, perf_counter
+from typing import Any, Callable
+from urllib.parse import urlsplit
+
+# 未设置deadline时,单次调用的默认超时(秒)
+DEFAULT_TIMEOUT = 10.0
+# classify返回该值时表示被限流
+THROTTLED = "throttled"
+
+
+@dataclass
+class HTTPTiming:
+    """一次外部HTTP调用的埋点数据,耗时单位均为秒"""
+    endpoint: str
+    method: str
+    # 不含query,避免把access_token之类的参数带进指标
+    url: str
+    status: int | None = None
+    dns: float = 0.0
+    connect: float = 0.0
+    tls: float = 0.0
+    ttfb: float = 0.0
+    total: float = 0.0
+    error: str | None = None
+    throttled: bool = False
+    # 请求开始的时间点(perf_counter),用于计算ttfb
+    started: float = field(default=0.0, repr=False)
+
+
+class Histogram:
+    # 默认桶的上界(秒),与prometheus客户端的默认值一致
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self, buckets: tuple[float, ...] = BUCKETS) -> None:
+        """耗时直方图
+
+        Args:
+            buckets:tuple[float],各个桶的上界,需要升序
+        """
+        self._buckets = buckets
+        # 最后一个桶存放超出上界的值
+        self._counts = [0] * (len(buckets) + 1)
+        self._sum = 0.0
+        self._max = 0.0
+
+    @property
+    def count(self) -> int:
+        return sum(self._counts)
+
+    def observe(self, value: float) -> None:
+        self._counts[bisect_left(self._buckets, value)] += 1
+        self._sum += value
+        self._max = max(self._max, value)
+
+    def percentile(self, q: float) -> float:
+        """估算分位数,返回所在桶的上界
+
+        Args:
+            q:float,分位,如0.99
+        """
+        if (total := self.count) == 0:
+            return 0.0
+
+        rank = q * total
+        seen = 0
+        for idx, count in enumerate(self._counts):
+            seen += count
+            if seen >= rank and count:
+                return self._buckets[idx] if idx < len(self._buckets) else self._max
+        return self._max
+
+    def snapshot(self) -> dict:
+        total = self.count
+        return {"count": total, "sum": self._sum, "max": self._max,
+                "avg": self._sum / total if total else 0.0,
+                "p50": self.percentile(0.5), "p90": self.percentile(0.9), "p99": self.percentile(0.99),
+                "buckets": dict(zip([*self._buckets, float("inf")], self._counts))}
+
+
+class EndpointStats:
+    def __init__(self) -> None:
+        """单个接口的统计"""
+        self.requests = 0
+        self.errors = 0
+        self.throttled = 0
+        self.total = Histogram()
+        self.ttfb = Histogram()
+
+    def record(self, timing: HTTPTiming) -> None:
+        self.requests += 1
+        if timing.error is not None:
+            self.errors += 1
+        if timing.throttled:
+            self.throttled += 1
+        self.total.observe(timing.total)
+        if timing.ttfb:
+            self.ttfb.observe(timing.ttfb)
+
+    def snapshot(self) -> dict:
+        return {"requests": self.requests, "errors": self.errors, "throttled": self.throttled,
+                "total": self.total.snapshot(), "ttfb": self.ttfb.snapshot()}
+
+
+class MetricsExporter:
+    """指标导出器,每次外部调用结束后调用export;默认什么都不做"""
+
+    def export(self, timing: HTTPTiming) -> None:
+        ...
+
+
+class LoggingExporter(MetricsExporter):
+    def __init__(self, logger_name: str = "jhu.outbound") -> None:
+        """把每次调用的耗时写入日志"""
+        self._logger = getLogger(logger_name)
+
+    def export(self, timing: HTTPTiming) -> None:
+        self._logger.info("%s %s %s status=%s dns=%.1fms connect=%.1fms tls=%.1fms ttfb=%.1fms total=%.1fms error=%s throttled=%s",
+                          timing.endpoint, timing.method, timing.url, timing.status,
+                          timing.dns * 1000, timing.connect * 1000, timing.tls * 1000,
+                          timing.ttfb * 1000, timing.total * 1000, timing.error, timing.throttled)
+
+
+class OutboundMetrics:
+    def __init__(self, exporter: MetricsExporter | None = None) -> None:
+        """外部调用的指标汇总
+
+        Args:
+            exporter:MetricsExporter,指标导出器,默认不导出
+        """
+        self.exporter = exporter or MetricsExporter()
+        self._stats: dict[str, EndpointStats] = {}
+        self._lock = Lock()
+
+    def record(self, timing: HTTPTiming) -> None:
+        with self._lock:
+            if (stats := self._stats.get(timing.endpoint)) is None:
+                stats = self._stats[timing.endpoint] = EndpointStats()
+            stats.record(timing)
+        self.exporter.export(timing)
+
+    def snapshot(self) -> dict[str, dict]:
+        """按接口返回统计数据"""
+        with self._lock:
+            return {endpoint: stats.snapshot() for endpoint, stats in self._stats.items()}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
+
+
+# 全局的指标汇总,auth和webhook的调用都会记录到这里
+metrics = OutboundMetrics()
+
+
+class DeadlineExceeded(TimeoutError):
+    """调用截止时间已过"""
+
+
+# 截止时间点(monotonic)
+_deadline: ContextVar[float | None] = ContextVar("jhu_outbound_deadline", default=None)
+# 当前调用的埋点数据,供连接对象记录各阶段耗时
+_timing: ContextVar[HTTPTiming | None] = ContextVar("jhu_outbound_timing", default=None)
+
+
+@contextmanager
+def deadline(seconds: float):
+    """设置调用截止时间,期间所有外部调用共享这个时间预算;嵌套时取更早的截止时间
+
+    Args:
+        seconds:float,从现在起的剩余时间(秒)
+    """
+    target = monotonic() + seconds
+    if (current := _deadline.get()) is not None:
+        target = min(target, current)
+    token = _deadline.set(target)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> float | None:
+    """距离截止时间的剩余秒数,未设置截止时间时返回None"""
+    if (target := _deadline.get()) is None:
+        return None
+    return target - monotonic()
+
+
+@cache
+def _adapter_class():
+    """创建带埋点的requests适配器类;requests在首次调用时才导入"""
+    from requests.adapters import HTTPAdapter
+    from urllib3.connection import HTTPConnection, HTTPSConnection
+    from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+    from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+    from urllib3.util.connection import allowed_gai_family
+
+    class TimedConnectionMixin:
+        def _new_conn(self):
+            if (timing := _timing.get()) is None:
+                return super()._new_conn()
+
+            # 单独解析域名以记录DNS耗时,再逐个地址建连
+            start = perf_counter()
+            try:
+                addrs = getaddrinfo(self._dns_host, self.port, allowed_gai_family(), SOCK_STREAM)
+            except OSError:
+                # 解析失败交给urllib3抛出原有的异常
+                return super()._new_conn()
+            resolved = perf_counter()
+            timing.dns += resolved - start
+
+            host = self._dns_host
+            try:
+                for idx, (*_, sockaddr) in enumerate(addrs):
+                    self._dns_host = sockaddr[0]
+                    try:
+                        sock = super()._new_conn()
+                        break
+                    except (ConnectTimeoutError, NewConnectionError):
+                        if idx == len(addrs) - 1:
+                            raise
+            finally:
+                self._dns_host = host
+
+            timing.connect += perf_counter() - resolved
+            return sock
+
+        def getresponse(self, *args, **kw):
+            response = super().getresponse(*args, **kw)
+            if (timing := _timing.get()) is not None and not timing.ttfb:
+                timing.ttfb = perf_counter() - timing.started
+            return response
+
+    class TimedHTTPConnection(TimedConnectionMixin, HTTPConnection):
+        ...
+
+    class TimedHTTPSConnection(TimedConnectionMixin, HTTPSConnection):
+        def connect(self):
+            if (timing := _timing.get()) is None:
+                return super().connect()
+
+            # connect = DNS + 建连 + TLS握手
+            start = perf_counter()
+            before = timing.dns + timing.connect
+            super().connect()
+            timing.tls += perf_counter() - start - (timing.dns + timing.connect - before)
+
+    class TimedHTTPConnectionPool(HTTPConnectionPool):
+        ConnectionCls = TimedHTTPConnection
+
+    class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+        ConnectionCls = TimedHTTPSConnection
+
+    class TimedHTTPAdapter(HTTPAdapter):
+        def init_poolmanager(self, *args, **kw):
+            super().init_poolmanager(*args, **kw)
+            self.poolmanager.pool_classes_by_scheme = {"http": TimedHTTPConnectionPool,
+                                                       "https": TimedHTTPSConnectionPool}
+
+    return TimedHTTPAdapter
+
+
+_local = local()
+
+
+def _session():
+    """每个线程一个session,复用上游连接"""
+    if (session := getattr(_local, "session", None)) is None:
+        from requests import Session
+
+        session = _local.session = Session()
+        adapter = _adapter_class()()
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+    return session
+
+
+def request(method: str, url: str, endpoint: str, timeout: float = DEFAULT_TIMEOUT, classify: Callable[[Any], str | None] | None = None, **kw):
+    """发起外部HTTP调用并记录指标
+
+    Args:
+        method:str,请求方法
+        url:str,请求地址
+        endpoint:str,指标中的接口名,如:dingtalk.user_info
+        timeout:float,超时(秒),设置了deadline时取两者较小值;
+            requests的读超时只限制单次读socket,因此响应返回后会再检查一次deadline,超出时抛出DeadlineExceeded
+        classify:Callable,根据响应判断调用结果:返回THROTTLED表示被限流,返回其他字符串表示失败(作为错误描述),返回None表示成功;
+            用于HTTP 200但在响应体中返回错误码的接口,HTTP 429始终视为限流
+        **kw:透传给requests
+
+    Returns:
+        requests.Response
+    """
+    parts = urlsplit(url)
+    timing = HTTPTiming(endpoint, method.upper(), f"{parts.scheme}://{parts.netloc}{parts.path}")
+
+    if (left := remaining()) is not None:
+        if left <= 0:
+            timing.error = DeadlineExceeded.__name__
+            metrics.record(timing)
+            raise DeadlineExceeded(f"{endpoint}调用前已超过截止时间")
+        timeout = min(timeout, left)
+
+    token = _timing.set(timing)
+    timing.started = perf_counter()
+    try:
+        response = _session().request(method, url, timeout=timeout, **kw)
+        timing.status = response.status_code
+        # 多次读取的耗时累计可能超出预算,整个调用以deadline为准
+        if left is not None and remaining() < 0:
+            response.close()
+            raise DeadlineExceeded(f"{endpoint}调用超过截止时间")
+
+        outcome = classify(response) if classify else None
+        timing.throttled = response.status_code == 429 or outcome == THROTTLED
+        if not timing.throttled:
+            if outcome is not None:
+                timing.error = outcome
+            elif response.status_code >= 400:
+                timing.error = f"HTTP {response.status_code}"
+        return response
+    except Exception as e:
+        timing.error = type(e).__name__
+        raise
+    finally:
+        timing.total = perf_counter() - timing.started
+        _timing.reset(token)
+        metrics.record(timing)
+
+
+def get(url: str, endpoint: str, **kw):
+    """GET请求,参考request"""
+    return request("GET", url, endpoint, **kw)
+
+
+def post(url: str, endpoint: str, **kw):
+    """POST请求,参考request"""
+    return request("POST", url, endpoint, **kw)
@@ -1,19 +1,33 @@
 """
 安全模块工具
+bcrypt,Cryptodome,jose以及asyncio在首次使用时才导入,减少import jhu.security的耗时
 """
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 from base64 import b64decode, b64encode
+from dataclasses import dataclass
+from hashlib import blake2b, sha256
+from math import ceil, log
+from os import cpu_count
+from threading import BoundedSemaphore, Lock
+from time import monotonic, time
+from typing import Any, Callable
 from uuid import uuid4
-from bcrypt import checkpw, gensalt, hashpw
-from Cryptodome.Cipher import AES
-from Cryptodome.Util.Padding import pad, unpad
-from jose import jwt
+from jose.exceptions import ExpiredSignatureError, JWTError
 
 
 class AESAPI:
     def __init__(self, key: str) -> None:
+        from Cryptodome.Cipher import AES
+        from Cryptodome.Util.Padding import pad, unpad
+
         # ECB模式,加密结果固定
         self._cipher = AES.new(key.encode(), AES.MODE_ECB)
+        # 只在初始化时导入,避免加解密时重复执行import
+        self._pad = pad
+        self._unpad = unpad
+        self._block_size = AES.block_size
 
     @property
     def cipher(self):
@@ -22,9 +36,8 @@ class AESAPI:
     def encrypt(self, plain_text: str) -> str:
         """加密:pad->encrypt->b64encode
         """
-
         # 对明文进行补全至块大小的填充
-        padded_text = pad(plain_text.encode(), AES.block_size)
+        padded_text = self._pad(plain_text.encode(), self._block_size)
 
         # 加密
         ciphertext = self.cipher.encrypt(padded_text)
@@ -35,12 +48,11 @@ class AESAPI:
     def decrypt(self, encrypted_value: str) -> str:
         """解密:b64decode->decrypt->unpad
         """
-
         # 将Base64编码的密文解码为字节
         ciphertext = b64decode(encrypted_value)
 
         # 解密
-        decrypted_text = unpad(self.cipher.decrypt(ciphertext), AES.block_size)
+        decrypted_text = self._unpad(self.cipher.decrypt(ciphertext), self._block_size)
 
         # 将解密后的字节串转换回字符串
         return decrypted_text.decode()
@@ -86,30 +98,426 @@ class AESAPI:
 
 
 class HashAPI:
+    # bcrypt默认的cost(即gensalt的rounds)
+    DEFAULT_ROUNDS = 12
+
     @staticmethod
-    def hash(plain_text: str) -> str:
+    def hash(plain_text: str, rounds: int = DEFAULT_ROUNDS) -> str:
         """明文哈希加密
+
+        Args:
+            plain_text:明文
+            rounds:bcrypt的cost,每加1计算耗时翻倍
         """
-        return hashpw(plain_text.encode(), gensalt()).decode()
+        from bcrypt import gensalt, hashpw
+        return hashpw(plain_text.encode(), gensalt(rounds)).decode()
 
     @staticmethod
     def verify(plain_text: str, hash_text: str) -> bool:
         """验证明文和密文的内容是否一致
         """
+        from bcrypt import checkpw
         return checkpw(plain_text.encode(), hash_text.encode())
 
+    @staticmethod
+    def rounds(hash_text: str) -> int:
+        """获取密文的cost, 密文格式如:$2b$12$...
+        """
+        return int(hash_text.split("$")[2])
+
+    @staticmethod
+    def needs_rehash(hash_text: str, rounds: int = DEFAULT_ROUNDS) -> bool:
+        """密文的cost和期望的cost不一致时,需要重新哈希
+        """
+        return HashAPI.rounds(hash_text) != rounds
+
+    @staticmethod
+    def verify_and_update(plain_text: str, hash_text: str, rounds: int = DEFAULT_ROUNDS) -> tuple[bool, str | None]:
+        """验证明文和密文,验证通过且cost不一致时顺带生成新的密文
+
+        Args:
+            plain_text:明文
+            hash_text:已存储的密文
+            rounds:期望的cost
+
+        Returns:
+            (是否验证通过, 新密文); 新密文不为None时,调用方应当保存新密文
+        """
+        if not HashAPI.verify(plain_text, hash_text):
+            return False, None
+
+        if HashAPI.needs_rehash(hash_text, rounds):
+            return True, HashAPI.hash(plain_text, rounds)
+
+        return True, None
+
+
+class HashRejectedError(Exception):
+    """哈希任务过多或排队超时,拒绝执行"""
+
+
+class HashPoolAPI:
+    def __init__(self, rounds: int = HashAPI.DEFAULT_ROUNDS, max_workers: int | None = None, max_pending: int | None = None, queue_timeout: float | None = None) -> None:
+        """线程池版本的HashAPI, bcrypt计算时会释放GIL, 放到线程池中不会阻塞调用方(如asyncio的事件循环)
+
+        Args:
+            rounds:int,bcrypt的cost
+            max_workers:int,同时进行bcrypt计算的线程数,默认为CPU核数
+            max_pending:int,执行中和排队中的任务上限,超出时直接拒绝,默认不限制
+            queue_timeout:float,任务排队的超时时间(秒),超时后调用方收到HashRejectedError,任务被取消不再计算,默认不限制
+        """
+        self._rounds = rounds
+        self._queue_timeout = queue_timeout
+        self._slots = BoundedSemaphore(max_pending) if max_pending else None
+        self._executor = ThreadPoolExecutor(max_workers or cpu_count() or 1,
+                                            thread_name_prefix="jhu-bcrypt")
+
+    @property
+    def rounds(self) -> int:
+        return self._rounds
+
+    def _deadline(self) -> float | None:
+        """排队的截止时间点(monotonic)"""
+        if self._queue_timeout is None:
+            return None
+        return monotonic() + self._queue_timeout
+
+    def _submit(self, fn: Callable, *args, deadline: float | None = None) -> Future:
+        """提交任务到线程池"""
+        # 任务已满时不排队,直接拒绝,避免撞库时请求无限堆积
+        if self._slots is not None and not self._slots.acquire(blocking=False):
+            raise HashRejectedError("哈希任务过多")
+
+        if deadline is None:
+            deadline = self._deadline()
+
+        def run():
+            # 排队超时的任务,调用方大概率已经放弃,无需再消耗CPU
+            if deadline is not None and monotonic() >= deadline:
+                raise HashRejectedError("哈希任务排队超时")
+            return fn(*args)
+
+        try:
+            future = self._executor.submit(run)
+        except BaseException:
+            if self._slots is not None:
+                self._slots.release()
+            raise
+
+        # 任务完成或者排队中被取消时都会回调,保证名额一定归还
+        if self._slots is not None:
+            future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def _result(self, fn: Callable, *args):
+        """提交任务并等待结果,排队超时后取消任务,调用方的等待时间不会超过queue_timeout太多"""
+        deadline = self._deadline()
+        future = self._submit(fn, *args, deadline=deadline)
+        if deadline is None:
+            return future.result()
+
+        try:
+            return future.result(timeout=max(deadline - monotonic(), 0))
+        except TimeoutError:
+            # 取消失败说明任务已经开始计算,等待计算完成即可
+            if future.cancel():
+                raise HashRejectedError("哈希任务排队超时")
+            return future.result()
+
+    async def _async_result(self, fn: Callable, *args):
+        """asyncio版本的_result"""
+        from asyncio import wait, wrap_future
+
+        deadline = self._deadline()
+        future = self._submit(fn, *args, deadline=deadline)
+        wrapped = wrap_future(future)
+        if deadline is not None:
+            done, _ = await wait({wrapped}, timeout=max(deadline - monotonic(), 0))
+            if not done and future.cancel():
+                raise HashRejectedError("哈希任务排队超时")
+        return await wrapped
+
+    def submit_hash(self, plain_text: str) -> Future:
+        """提交哈希任务,返回Future"""
+        return self._submit(HashAPI.hash, plain_text, self.rounds)
+
+    def submit_verify(self, plain_text: str, hash_text: str) -> Future:
+        """提交验证任务,返回Future"""
+        return self._submit(HashAPI.verify, plain_text, hash_text)
+
+    def submit_verify_and_update(self, plain_text: str, hash_text: str) -> Future:
+        """提交验证任务(cost不一致时重新哈希),返回Future"""
+        return self._submit(HashAPI.verify_and_update, plain_text, hash_text, self.rounds)
+
+    def hash(self, plain_text: str) -> str:
+        """明文哈希加密"""
+        return self._result(HashAPI.hash, plain_text, self.rounds)
+
+    def verify(self, plain_text: str, hash_text: str) -> bool:
+        """验证明文和密文的内容是否一致"""
+        return self._result(HashAPI.verify, plain_text, hash_text)
+
+    def verify_and_update(self, plain_text: str, hash_text: str) -> tuple[bool, str | None]:
+        """验证明文和密文,参考HashAPI.verify_and_update"""
+        return self._result(HashAPI.verify_and_update, plain_text, hash_text, self.rounds)
+
+    async def async_hash(self, plain_text: str) -> str:
+        """明文哈希加密(asyncio)"""
+        return await self._async_result(HashAPI.hash, plain_text, self.rounds)
+
+    async def async_verify(self, plain_text: str, hash_text: str) -> bool:
+        """验证明文和密文的内容是否一致(asyncio)"""
+        return await self._async_result(HashAPI.verify, plain_text, hash_text)
+
+    async def async_verify_and_update(self, plain_text: str, hash_text: str) -> tuple[bool, str | None]:
+        """验证明文和密文,参考HashAPI.verify_and_update(asyncio)"""
+        return await self._async_result(HashAPI.verify_and_update, plain_text, hash_text, self.rounds)
+
+    def close(self, wait: bool = True) -> None:
+        """关闭线程池"""
+        self._executor.shutdown(wait=wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class BloomFilter:
+    def __init__(self, capacity: int, error_rate: float = 0.001) -> None:
+        """布隆过滤器,判断不存在时一定不存在,判断存在时可能误判
+
+        Args:
+            capacity:int,预计存放的元素数量
+            error_rate:float,元素数量达到capacity时的误判率
+        """
+        self._size = max(8, ceil(-capacity * log(error_rate) / log(2) ** 2))
+        self._hashes = max(1, round(self._size / capacity * log(2)))
+        self._bits = bytearray((self._size + 7) // 8)
+
+    def _indexes(self, item: str):
+        """双重哈希生成k个位置"""
+        digest = blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8])
+        h2 = int.from_bytes(digest[8:]) | 1
+        return ((h1 + i * h2) % self._size for i in range(self._hashes))
+
+    def add(self, item: str) -> None:
+        for idx in self._indexes(item):
+            self._bits[idx >> 3] |= 1 << (idx & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[idx >> 3] & (1 << (idx & 7)) for idx in self._indexes(item))
+
+
+class JTIRevocation:
+    def __init__(self, bloom_capacity: int = 0, error_rate: float = 0.001) -> None:
+        """基于jti的token吊销列表,可在多个JWTAPI之间共享
+
+        Args:
+            bloom_capacity:int,布隆过滤器容量,为0时不使用布隆过滤器
+            error_rate:float,布隆过滤器的误判率
+        """
+        self._bloom_capacity = bloom_capacity
+        self._error_rate = error_rate
+        self._bloom = BloomFilter(bloom_capacity, error_rate) if bloom_capacity else None
+        # jti -> exp, token过期后吊销记录即可清理
+        self._revoked: dict[str, float] = {}
+        # 写操作加锁;读操作不加锁,只读取替换后的完整对象
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._revoked)
+
+    def revoke(self, jti: str, exp: float) -> None:
+        """吊销token
+
+        Args:
+            jti:str,token的jti
+            exp:float,token的过期时间戳
+        """
+        with self._lock:
+            # 先加入布隆过滤器,避免并发的is_revoked被过滤器误拦
+            if self._bloom is not None:
+                self._bloom.add(jti)
+            self._revoked[jti] = exp
+
+    def is_revoked(self, jti: str) -> bool:
+        """判断token是否被吊销"""
+        # 布隆过滤器判断不存在时,无需再查字典
+        if (bloom := self._bloom) is not None and jti not in bloom:
+            return False
+        return jti in self._revoked
+
+    def purge(self) -> int:
+        """清理已过期token的吊销记录,并重建布隆过滤器
+
+        Returns:
+            int:清理的记录数
+        """
+        now = time()
+        with self._lock:
+            expired = [jti for jti, exp in self._revoked.items() if exp <= now]
+            for jti in expired:
+                del self._revoked[jti]
+
+            # 新的布隆过滤器构建完成后再替换,期间的is_revoked仍使用旧的过滤器
+            if self._bloom is not None:
+                bloom = BloomFilter(self._bloom_capacity, self._error_rate)
+                for jti in self._revoked:
+                    bloom.add(jti)
+                self._bloom = bloom
+
+        return len(expired)
+
+
+class JWTRevokedError(JWTError):
+    """token已被吊销"""
+
+
+@dataclass
+class JWTKey:
+    """JWT密钥,密钥轮换时通过kid区分"""
+    # HS为共享密钥,RS/ES为私钥(PEM);仅做验证时也可以直接填公钥
+    key: str
+    # 写入token头部的kid
+    kid: str | None = None
+    # RS/ES的公钥(PEM),为空时由私钥推导
+    public_key: str | None = None
+
+
+class JWTBackend:
+    """JWT的实现后端,密钥在JWTAPI初始化时通过prepare_key预处理一次"""
+    name = ""
+
+    def prepare_key(self, key: str, algorithm: str) -> Any:
+        """把字符串密钥解析为后端的密钥对象"""
+        raise NotImplementedError
+
+    def verify_key(self, key: Any, algorithm: str) -> Any:
+        """由prepare_key的结果得到验证用的密钥对象"""
+        raise NotImplementedError
+
+    def encode(self, claims: dict, key: Any, algorithm: str, headers: dict | None = None) -> str:
+        raise NotImplementedError
+
+    def decode(self, token: str, key: Any, algorithm: str) -> dict:
+        """验证并解码token,失败时抛出JWTError"""
+        raise NotImplementedError
+
+    def get_unverified_header(self, token: str) -> dict:
+        raise NotImplementedError
+
+
+class JoseBackend(JWTBackend):
+    """python-jose后端"""
+    name = "jose"
+
+    def __init__(self) -> None:
+        from jose import jwk, jwt
+        self._jwk = jwk
+        self._jwt = jwt
+
+    def prepare_key(self, key: str, algorithm: str) -> Any:
+        return self._jwk.construct(key, algorithm)
+
+    def verify_key(self, key: Any, algorithm: str) -> Any:
+        return key if algorithm.startswith("HS") else key.public_key()
+
+    def encode(self, claims: dict, key: Any, algorithm: str, headers: dict | None = None) -> str:
+        return self._jwt.encode(claims, key=key, algorithm=algorithm, headers=headers)
+
+    def decode(self, token: str, key: Any, algorithm: str) -> dict:
+        return self._jwt.decode(token=token, key=key, algorithms=[algorithm])
+
+    def get_unverified_header(self, token: str) -> dict:
+        return self._jwt.get_unverified_header(token)
+
+
+class PyJWTBackend(JWTBackend):
+    """PyJWT后端,需要安装 jhu[jwt]"""
+    name = "pyjwt"
+
+    def __init__(self) -> None:
+        import jwt as pyjwt
+        self._jwt = pyjwt
+
+    def prepare_key(self, key: str, algorithm: str) -> Any:
+        return self._jwt.get_algorithm_by_name(algorithm).prepare_key(key)
+
+    def verify_key(self, key: Any, algorithm: str) -> Any:
+        # cryptography的私钥对象才有public_key方法
+        public_key = getattr(key, "public_key", None)
+        return public_key() if callable(public_key) else key
+
+    def encode(self, claims: dict, key: Any, algorithm: str, headers: dict | None = None) -> str:
+        return self._jwt.encode(claims, key, algorithm=algorithm, headers=headers)
+
+    def decode(self, token: str, key: Any, algorithm: str) -> dict:
+        # 异常统一转换为python-jose的异常,调用方无需关心后端
+        try:
+            return self._jwt.decode(token, key, algorithms=[algorithm])
+        except self._jwt.ExpiredSignatureError as e:
+            raise ExpiredSignatureError(str(e)) from e
+        except self._jwt.InvalidTokenError as e:
+            raise JWTError(str(e)) from e
+
+    def get_unverified_header(self, token: str) -> dict:
+        try:
+            return self._jwt.get_unverified_header(token)
+        except self._jwt.InvalidTokenError as e:
+            raise JWTError(str(e)) from e
+
 
 class JWTAPI:
-    def __init__(self, key: str, algorithm: str = "HS256") -> None:
+    def __init__(self, key: str | JWTKey | list[JWTKey], algorithm: str = "HS256", cache_size: int = 0, revocation: JTIRevocation | None = None, backend: JWTBackend | None = None) -> None:
         """JWT对象
 
         Args:
-            key:str,密钥
+            key:str|JWTKey|list[JWTKey],密钥;为列表时第一个密钥用于签名,所有密钥均可用于验证(按kid选择),每个密钥都需要设置不重复的kid
             algorithm:str,加密算法
+            cache_size:int,已验证token的LRU缓存数量,为0时不缓存
+            revocation:JTIRevocation,token吊销列表,默认每个JWTAPI独立一份
+            backend:JWTBackend,JWT的实现后端,默认为JoseBackend
 
         """
-        self._key = key
+        keys = key if isinstance(key, list) else [key]
+        keys = [k if isinstance(k, JWTKey) else JWTKey(k) for k in keys]
+        if not keys:
+            raise ValueError("至少需要一个密钥")
+        # 多个密钥时按kid选择,kid必须设置且不能重复
+        if len(keys) > 1:
+            kids = [k.kid for k in keys]
+            if None in kids or len(set(kids)) != len(kids):
+                raise ValueError("多个密钥时每个密钥都需要设置不重复的kid")
+
         self._algorithm = algorithm
+        self._backend = backend or JoseBackend()
+        self._revocation = revocation if revocation is not None else JTIRevocation()
+
+        # 密钥只在初始化时解析一次
+        self._key = keys[0].key
+        self._kid = keys[0].kid
+        self._sign_key = self._backend.prepare_key(self._key, algorithm)
+        self._verify_keys: dict[str | None, Any] = {}
+        for k in keys:
+            if k.public_key:
+                verify_key = self._backend.prepare_key(k.public_key, algorithm)
+            else:
+                verify_key = self._backend.verify_key(
+                    self._backend.prepare_key(k.key, algorithm), algorithm)
+            self._verify_keys[k.kid] = verify_key
+        # 没有kid的token使用签名密钥验证
+        self._verify_keys[None] = self._verify_keys[self._kid]
+        self._single_key = len(keys) == 1 and self._kid is None
+
+        # token摘要 -> (exp, claims)
+        self._cache_size = cache_size
+        self._cache: OrderedDict[bytes, tuple[float, dict]] = OrderedDict()
+        self._cache_lock = Lock()
+        self._hits = 0
+        self._misses = 0
 
     @property
     def key(self):
@@ -119,6 +527,14 @@ class JWTAPI:
     def algorithm(self):
         return self._algorithm
 
+    @property
+    def backend(self) -> JWTBackend:
+        return self._backend
+
+    @property
+    def revocation(self) -> JTIRevocation:
+        return self._revocation
+
     def encode(self, expire_min: float, **kw) -> str:
         """编码JWT的token, 其中jti,iat,exp会自动生成,无需设置
 
@@ -130,12 +546,78 @@ class JWTAPI:
         iat = datetime.now(timezone.utc)
         exp = iat + timedelta(minutes=expire_min)
         payload = dict(**kw, exp=exp, iat=iat, jti=jti)
-        return jwt.encode(payload, key=self.key, algorithm=self.algorithm)
+        headers = {"kid": self._kid} if self._kid is not None else None
+        return self.backend.encode(payload, self._sign_key, self.algorithm, headers)
+
+    def _decode(self, token: str) -> dict:
+        """按kid选择密钥并验证token"""
+        if self._single_key:
+            key = self._verify_keys[None]
+        else:
+            kid = self.backend.get_unverified_header(token).get("kid")
+            if (key := self._verify_keys.get(kid)) is None:
+                raise JWTError(f"Unknown kid: {kid}")
+        return self.backend.decode(token, key, self.algorithm)
+
+    def _verify(self, token: str) -> dict:
+        """验证token并返回claims,不检查吊销"""
+        if not self._cache_size:
+            return self._decode(token)
+
+        digest = sha256(token.encode()).digest()
+        with self._cache_lock:
+            if (item := self._cache.get(digest)) is not None:
+                exp, claims = item
+                # 过期的缓存不再使用,交给后端抛出过期异常
+                if exp > time():
+                    self._cache.move_to_end(digest)
+                    self._hits += 1
+                    return dict(claims)
+                del self._cache[digest]
+            self._misses += 1
+
+        claims = self._decode(token)
+
+        # 没有exp的token无法判断何时失效,不缓存
+        if (exp := claims.get("exp")) is not None:
+            with self._cache_lock:
+                self._cache[digest] = (exp, dict(claims))
+                self._cache.move_to_end(digest)
+                while len(self._cache) > self._cache_size:
+                    self._cache.popitem(last=False)
+
+        return claims
 
     def decode(self, token: str) -> dict:
         """解码JWT的token
         """
-        return jwt.decode(token=token, key=self.key, algorithms=[self.algorithm])
+        claims = self._verify(token)
+
+        if len(self.revocation) and (jti := claims.get("jti")) and self.revocation.is_revoked(jti):
+            raise JWTRevokedError("Token has been revoked.")
+
+        return claims
+
+    def revoke(self, token: str) -> None:
+        """吊销JWT的token,吊销后decode会抛出JWTRevokedError
+        """
+        claims = self._verify(token)
+        self.revocation.revoke(claims["jti"], claims["exp"])
+
+    def cache_info(self) -> dict:
+        """缓存统计信息"""
+        with self._cache_lock:
+            total = self._hits + self._misses
+            return {"hits": self._hits, "misses": self._misses,
+                    "hit_rate": self._hits / total if total else 0.0,
+                    "size": len(self._cache), "maxsize": self._cache_size}
+
+    def cache_clear(self) -> None:
+        """清空缓存以及统计信息"""
+        with self._cache_lock:
+            self._cache.clear()
+            self._hits = 0
+            self._misses = 0
 
 
 if __name__ == "__main__":
@@ -11,9 +11,9 @@ from base64 import b64encode
 from enum import IntEnum
 from hashlib import sha256
 from hmac import new as hmac_new
-from requests import session
 from time import time
 from urllib.parse import quote_plus
+from jhu.outbound import THROTTLED, post
 
 
 class WebHookType(IntEnum):
@@ -21,6 +21,27 @@ class WebHookType(IntEnum):
     WECOM = 1
 
 
+# 限流的错误码,钉钉:每分钟发送超过20条;企微:接口调用超过限制
+THROTTLE_ERRCODES = {
+    WebHookType.DINGTALK: {130101, 410100},
+    WebHookType.WECOM: {45009},
+}
+
+
+def _classify(webhook: WebHookType, rsp) -> str | None:
+    """根据返回的errcode判断调用结果;webhook出错时HTTP状态码仍为200"""
+    try:
+        errcode = rsp.json().get("errcode")
+    except ValueError:
+        return "invalid json"
+
+    if errcode in THROTTLE_ERRCODES[webhook]:
+        return THROTTLED
+    if errcode != 0:
+        return f"errcode {errcode}"
+    return None
+
+
 class WebHook:
     def __init__(self, webhook: WebHookType, url: str, sk: str | None = None) -> None:
         """Webhook对象
@@ -123,8 +144,9 @@ class WebHook:
                     url = f"{url}&timestamp={timestamp}&sign={sign}"
 
         # 消息发送
-        with session() as s:
-            result = s.post(url, json=data)
+        endpoint = f"{self.webhook.name.lower()}.webhook"
+        result = post(url, endpoint, json=data,
+                      classify=lambda rsp: _classify(self.webhook, rsp))
 
         rsp = result.json()
         if rsp["errcode"] != 0:
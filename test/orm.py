@@ -0,0 +1,105 @@
+"""
+测试
+"""
+from datetime import datetime
+import pytest
+from sqlalchemy import Integer, String, DateTime, create_engine, event, insert, select, text
+from sqlalchemy.orm import DeclarativeBase, Mapped, Session, mapped_column
+from jhu.orm import ORM, ORMCheckRule, _limit_one
+
+
+class Base(DeclarativeBase):
+    ...
+
+
+class User(Base):
+    __tablename__ = "user"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    account: Mapped[str] = mapped_column(String(32))
+    status: Mapped[int] = mapped_column(Integer)
+    created_at: Mapped[datetime] = mapped_column(DateTime)
+
+
+@pytest.fixture
+def session():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.execute(insert(User), [{"id": i, "account": f"acct{i}", "status": i % 2, "created_at": datetime(2024, 1, 1)}
+                                       for i in range(1, 101)])
+        session.commit()
+        yield session
+
+
+@pytest.fixture
+def statements(session):
+    """记录执行的SQL"""
+    sqls = []
+    event.listen(session.get_bind(), "before_cursor_execute", lambda conn, cursor, sql, *args: sqls.append(sql))
+    return sqls
+
+
+def test_one(session, statements):
+    assert ORM.one(session, select(User.id, User.created_at).where(User.status == 1)) == {"id": 1, "created_at": "2024-01-01 08:00:00"}
+    assert "LIMIT" in statements[-1]
+    assert ORM.one(session, select(User.id).where(User.status == 2)) is None
+
+    # 已有limit/offset时保持不变
+    assert ORM.one(session, select(User.id).order_by(User.id).offset(5).limit(3)) == {"id": 6}
+
+
+def test_limit_one():
+    """_limit_one依赖sqlalchemy的私有属性,升级sqlalchemy后需确保one不会退化为读取全部数据"""
+    stmt = select(User.id)
+    assert stmt._limit_clause is None
+    assert "LIMIT" in str(_limit_one(stmt))
+    # 已有limit时保持不变
+    limited = stmt.limit(3)
+    assert _limit_one(limited) is limited
+    # 非select语句原样返回
+    assert _limit_one(text("select 1")).text == "select 1"
+
+
+def test_scalar_first(session, statements):
+    assert ORM.scalar_first(session, select(User.account).where(User.id > 10).order_by(User.id)) == "acct11"
+    assert "LIMIT" in statements[-1]
+    assert ORM.scalar_first(session, select(User.account).where(User.id > 100)) is None
+
+
+def test_exists(session, statements):
+    assert ORM.exists(session, select(User.id).where(User.status == 1))
+    assert "EXISTS" in statements[-1]
+    assert not ORM.exists(session, select(User.id).where(User.status == 2))
+
+
+def test_counts(session):
+    assert ORM.counts(session, select(User.id).where(User.status == 1)) == 50
+    assert ORM.counts(session, select(User.id).where(User.status == 2)) == 0
+
+
+def test_check(session, statements):
+    rules = [ORMCheckRule(1, User.account == "nobody"), ORMCheckRule(2, User.account == "acct5")]
+    assert ORM.check(session, rules) == 2
+    assert all("EXISTS" in sql for sql in statements)
+    # 例外表达式排除本条数据
+    assert ORM.check(session, rules, User.id != 5) is None
+
+
+def test_compiled_cache(session):
+    """结构相同、参数不同的语句只编译一次"""
+    def run(idx: int):
+        ORM.one(session, select(User.id).where(User.id == idx))
+        ORM.exists(session, select(User.id).where(User.id == idx))
+        ORM.counts(session, select(User.id).where(User.id == idx))
+        ORM.check(session, [ORMCheckRule(1, User.account == f"acct{idx}")], User.id != idx)
+
+    run(1)
+    cache = session.get_bind()._compiled_cache
+    size = len(cache)
+    for idx in range(2, 10):
+        run(idx)
+    assert len(cache) == size
+
+
+if __name__ == "__main__":
+    ...
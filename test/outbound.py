@@ -0,0 +1,137 @@
+"""
+测试
+"""
+import json
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+from time import sleep
+import pytest
+from requests.exceptions import Timeout
+from jhu.outbound import DeadlineExceeded, Histogram, MetricsExporter, deadline, get, metrics, post
+from jhu.webhook import WebHook, WebHookType
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        if self.path.startswith("/slow"):
+            sleep(0.2)
+        if self.path.startswith("/trickle"):
+            return self.trickle()
+        status = 429 if self.path.startswith("/busy") else 200
+        self.reply(status, {"errcode": 0})
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        if self.path.startswith("/robot/bad"):
+            self.reply(200, {"errcode": 310000, "errmsg": "sign not match"})
+        else:
+            self.reply(200, {"errcode": 410100, "errmsg": "send too fast"})
+
+    def reply(self, status: int, data: dict):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def trickle(self):
+        # 每次读取都不超时,但整个响应的耗时超出预算
+        self.send_response(200)
+        self.send_header("Content-Length", "4")
+        self.end_headers()
+        for _ in range(4):
+            sleep(0.04)
+            self.wfile.write(b"0")
+
+    def log_message(self, *args):
+        ...
+
+
+@pytest.fixture(scope="module")
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_port}"
+    httpd.shutdown()
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    metrics.reset()
+    yield
+    metrics.exporter = MetricsExporter()
+
+
+def test_metrics(server):
+    timings = []
+
+    class ListExporter(MetricsExporter):
+        def export(self, timing):
+            timings.append(timing)
+
+    metrics.exporter = ListExporter()
+    get(f"{server}/ok?access_token=secret", "test.ok")
+    get(f"{server}/ok", "test.ok")
+    get(f"{server}/busy", "test.busy")
+
+    stats = metrics.snapshot()
+    assert stats["test.ok"]["requests"] == 2
+    assert stats["test.busy"]["throttled"] == 1
+    assert stats["test.busy"]["errors"] == 0
+
+    first, second, _ = timings
+    assert first.url == f"{server}/ok"
+    assert first.status == 200
+    assert first.connect > 0 and first.ttfb > 0 and first.total >= first.ttfb
+    # 第二次调用复用连接
+    assert second.connect == 0
+
+
+def test_deadline(server):
+    with deadline(0.05):
+        with pytest.raises(Timeout):
+            get(f"{server}/slow", "test.slow")
+        with pytest.raises(DeadlineExceeded):
+            sleep(0.05)
+            get(f"{server}/ok", "test.ok")
+
+    stats = metrics.snapshot()
+    assert stats["test.slow"]["errors"] == 1
+    assert stats["test.ok"]["errors"] == 1
+
+
+def test_deadline_overrun(server):
+    with deadline(0.1):
+        with pytest.raises(DeadlineExceeded):
+            get(f"{server}/trickle", "test.trickle")
+
+    stats = metrics.snapshot()["test.trickle"]
+    assert stats["errors"] == 1
+    assert stats["total"]["max"] >= 0.1
+
+
+def test_webhook_throttled(server):
+    with pytest.raises(Exception, match="send too fast"):
+        WebHook(WebHookType.DINGTALK, f"{server}/robot/send?access_token=secret").send({"msgtype": "text"})
+    assert metrics.snapshot()["dingtalk.webhook"]["throttled"] == 1
+
+
+def test_webhook_error(server):
+    # 钉钉签名错误时HTTP状态码仍为200,按errcode计为错误
+    with pytest.raises(Exception, match="sign not match"):
+        WebHook(WebHookType.DINGTALK, f"{server}/robot/bad?access_token=secret", "sk").send({"msgtype": "text"})
+
+    stats = metrics.snapshot()["dingtalk.webhook"]
+    assert stats["errors"] == 1
+    assert stats["throttled"] == 0
+
+
+def test_histogram():
+    h = Histogram()
+    for v in [0.001] * 98 + [0.3, 20]:
+        h.observe(v)
+    assert h.percentile(0.5) == 0.005
+    assert h.percentile(0.99) == 0.5
+    assert h.percentile(1) == 20
@@ -2,7 +2,16 @@
 """
 测试
 """
-from jhu.security import HashAPI, JWTAPI, AESAPI
+import asyncio
+import subprocess
+import sys
+from threading import Event, Thread
+from time import monotonic
+import pytest
+from jhu.security import HashAPI, HashPoolAPI, HashRejectedError, JWTAPI, AESAPI
+from jhu.security import BloomFilter, JTIRevocation, JWTRevokedError
+from jhu.security import JWTKey, JoseBackend, PyJWTBackend
+from jose.exceptions import ExpiredSignatureError, JWTError
 
 
 def test_hashapi():
@@ -12,8 +21,251 @@ def test_hashapi():
     assert a.verify(plain_text, hash_value) == True
 
 
+def test_hashapi_rehash():
+    plain_text = "1234567890987654321"
+    hash_value = HashAPI.hash(plain_text, rounds=4)
+    assert HashAPI.rounds(hash_value) == 4
+
+    # cost一致,无需重新哈希
+    assert HashAPI.verify_and_update(plain_text, hash_value, 4) == (True, None)
+
+    # cost不一致,验证通过后返回新密文
+    ok, new_hash = HashAPI.verify_and_update(plain_text, hash_value, 5)
+    assert ok and HashAPI.rounds(new_hash) == 5
+    assert HashAPI.verify(plain_text, new_hash)
+
+    assert HashAPI.verify_and_update("wrong", hash_value, 5) == (False, None)
+
+
+def test_hashpoolapi():
+    plain_text = "1234567890987654321"
+    with HashPoolAPI(rounds=4, max_workers=2) as pool:
+        hash_value = pool.hash(plain_text)
+        assert pool.verify(plain_text, hash_value)
+
+        async def login():
+            return await pool.async_verify(plain_text, hash_value)
+
+        assert asyncio.run(login())
+
+
+def test_hashpoolapi_rejected():
+    with HashPoolAPI(rounds=4, max_workers=1, max_pending=1) as pool:
+        # 占住唯一的任务名额
+        event = Event()
+        future = pool._submit(event.wait)
+        with pytest.raises(HashRejectedError):
+            pool.submit_hash("b" * 10)
+        event.set()
+        future.result()
+        assert pool.hash("b" * 10)
+
+    with HashPoolAPI(rounds=4, max_workers=1, queue_timeout=0) as pool:
+        with pytest.raises(HashRejectedError):
+            pool.hash("a" * 10)
+
+
+def test_hashpoolapi_queue_timeout():
+    with HashPoolAPI(rounds=4, max_workers=1, max_pending=3, queue_timeout=0.1) as pool:
+        event = Event()
+        blocker = pool._submit(event.wait, deadline=float("inf"))
+
+        # 前面的任务未完成时,调用方在queue_timeout左右即被拒绝,而不是一直等待
+        begin = monotonic()
+        with pytest.raises(HashRejectedError):
+            pool.hash("a" * 10)
+
+        async def login():
+            return await pool.async_verify("a" * 10, "")
+
+        with pytest.raises(HashRejectedError):
+            asyncio.run(login())
+        assert monotonic() - begin < 1
+
+        event.set()
+        blocker.result()
+        # 被取消的任务已归还名额
+        assert all(pool._slots.acquire(timeout=1) for _ in range(3))
+
+
+def test_hashpoolapi_cancelled():
+    with HashPoolAPI(rounds=4, max_workers=1, max_pending=2) as pool:
+        event = Event()
+        blocker = pool._submit(event.wait)
+
+        async def login():
+            await asyncio.wait_for(pool.async_hash("a" * 10), 0.05)
+
+        # 调用方超时后,排队中的任务被取消,名额随之归还
+        with pytest.raises(asyncio.TimeoutError):
+            asyncio.run(login())
+        assert pool._slots._value == 1
+
+        event.set()
+        blocker.result()
+        assert all(pool._slots.acquire(timeout=1) for _ in range(2))
+
+
+def test_lazy_import():
+    # 仅导入模块时,不应该导入bcrypt,Cryptodome,jose.jwt等依赖
+    code = ("import sys, jhu; jhu.HashAPI; jhu.JWTAPI;"
+            "assert not {'bcrypt', 'Cryptodome', 'jose.jwt', 'asyncio'} & set(sys.modules)")
+    subprocess.run([sys.executable, "-c", code], check=True)
+
+
 def test_jwtapi():
-    ...
+    api = JWTAPI("secret")
+    token = api.encode(1, uid=1)
+    assert api.decode(token)["uid"] == 1
+
+
+def test_jwtapi_kid():
+    old = JWTAPI(JWTKey("old-secret", kid="k1"))
+    new = JWTAPI([JWTKey("new-secret", kid="k2"), JWTKey("old-secret", kid="k1")])
+
+    # 轮换期间新旧token都可以验证
+    assert new.decode(old.encode(1, uid=1))["uid"] == 1
+    assert new.decode(new.encode(1, uid=2))["uid"] == 2
+
+    with pytest.raises(JWTError):
+        old.decode(new.encode(1))
+
+    # 没有kid的token使用签名密钥验证
+    assert new.decode(JWTAPI("new-secret").encode(1, uid=3))["uid"] == 3
+
+
+def test_jwtapi_kid_required():
+    # 多个密钥时kid缺失或重复都无法按kid选择密钥
+    for keys in ([JWTKey("new-secret"), JWTKey("old-secret")],
+                 [JWTKey("new-secret", kid="k2"), JWTKey("old-secret")],
+                 [JWTKey("new-secret", kid="k1"), JWTKey("old-secret", kid="k1")]):
+        with pytest.raises(ValueError):
+            JWTAPI(keys)
+
+
+@pytest.mark.parametrize("algorithm", ["HS256", "RS256", "ES256"])
+def test_jwtapi_backend(algorithm):
+    pytest.importorskip("jwt")
+    serialization = pytest.importorskip("cryptography.hazmat.primitives.serialization")
+    from cryptography.hazmat.primitives.asymmetric import ec, rsa
+
+    match(algorithm):
+        case "RS256":
+            private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        case "ES256":
+            private_key = ec.generate_private_key(ec.SECP256R1())
+        case _:
+            private_key = None
+
+    if private_key is None:
+        key = JWTKey("0123456789abcdef0123456789abcdef")
+    else:
+        pem = private_key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                        serialization.NoEncryption()).decode()
+        key = JWTKey(pem)
+
+    jose_api = JWTAPI(key, algorithm, backend=JoseBackend())
+    pyjwt_api = JWTAPI(key, algorithm, backend=PyJWTBackend())
+
+    # 两个后端生成的token可以互相验证
+    assert pyjwt_api.decode(jose_api.encode(1, uid=1))["uid"] == 1
+    assert jose_api.decode(pyjwt_api.encode(1, uid=2))["uid"] == 2
+
+    # 异常统一为python-jose的异常
+    with pytest.raises(ExpiredSignatureError):
+        pyjwt_api.decode(pyjwt_api.encode(-1))
+    with pytest.raises(JWTError):
+        pyjwt_api.decode("invalid")
+
+
+def test_jwtapi_cache():
+    api = JWTAPI("secret", cache_size=2)
+    tokens = [api.encode(1, uid=i) for i in range(3)]
+
+    assert api.decode(tokens[0])["uid"] == 0
+    assert api.decode(tokens[0])["uid"] == 0
+    info = api.cache_info()
+    assert (info["hits"], info["misses"], info["size"]) == (1, 1, 1)
+
+    # 超过容量时淘汰最久未使用的token
+    api.decode(tokens[1])
+    api.decode(tokens[2])
+    assert api.cache_info()["size"] == 2
+    api.decode(tokens[0])
+    assert api.cache_info()["misses"] == 4
+
+    # 返回的claims为副本,修改不影响缓存
+    api.decode(tokens[0])["uid"] = 100
+    assert api.decode(tokens[0])["uid"] == 0
+
+
+def test_jwtapi_revoke():
+    revocation = JTIRevocation(bloom_capacity=1000)
+    api = JWTAPI("secret", cache_size=10, revocation=revocation)
+    token, other = api.encode(1), api.encode(1)
+    api.decode(token)
+
+    api.revoke(token)
+    with pytest.raises(JWTRevokedError):
+        api.decode(token)
+    assert api.decode(other)
+
+    # 共享吊销列表的JWTAPI同样生效
+    with pytest.raises(JWTRevokedError):
+        JWTAPI("secret", revocation=revocation).decode(token)
+
+    assert revocation.purge() == 0
+    assert len(revocation) == 1
+
+
+def test_jtirevocation_purge():
+    revocation = JTIRevocation(bloom_capacity=1000)
+    for i in range(10):
+        revocation.revoke(f"expired{i}", 0)
+    revocation.revoke("alive", float("inf"))
+
+    assert revocation.purge() == 10
+    assert len(revocation) == 1
+    assert revocation.is_revoked("alive")
+    assert not revocation.is_revoked("expired0")
+
+
+def test_jtirevocation_concurrent():
+    revocation = JTIRevocation(bloom_capacity=10000)
+    revocation.revoke("alive", float("inf"))
+    stop = Event()
+    errors = []
+
+    def writer():
+        i = 0
+        while not stop.is_set():
+            revocation.revoke(f"jti{i}", 0)
+            i += 1
+
+    def reader():
+        while not stop.is_set():
+            if not revocation.is_revoked("alive"):
+                errors.append("alive")
+
+    threads = [Thread(target=writer), Thread(target=reader)]
+    for t in threads:
+        t.start()
+    # 清理期间不能抛出异常,也不能放过已吊销的token
+    for _ in range(50):
+        revocation.purge()
+    stop.set()
+    for t in threads:
+        t.join()
+
+    assert not errors
+
+
+def test_bloomfilter():
+    bloom = BloomFilter(1000)
+    for i in range(1000):
+        bloom.add(f"jti{i}")
+    assert all(f"jti{i}" in bloom for i in range(1000))
+    assert sum(f"other{i}" in bloom for i in range(1000)) < 20
 
 
 def test_aesapi():
@@ -23,3 +275,4 @@ def test_aesapi():
 if __name__ == '__main__':
 
     # HashAPI
+    ...